@@ -3,16 +3,25 @@
 
 import argparse
 import asyncio
+import bisect
 import csv
+import itertools
 import json
 import logging
 import random
+import re
 import signal
 import sys
+import time
+from dataclasses import dataclass
 from datetime import datetime
+from html.parser import HTMLParser
 from pathlib import Path
-from urllib.parse import urlparse, parse_qs, urlencode, unquote
+from urllib.parse import urlparse, parse_qs, urlencode, unquote, urljoin
 
+import ahocorasick
+import httpx
+import orjson
 from playwright.async_api import async_playwright
 
 # ---------------------------------------------------------------------------
@@ -21,9 +30,17 @@ from playwright.async_api import async_playwright
 BASE_DIR = Path(__file__).resolve().parent
 OUTPUT_DIR = BASE_DIR / "output"
 LOGS_DIR = BASE_DIR / "logs"
+STATE_PATH = OUTPUT_DIR / "state.json"
 
-collected_results: list[dict] = []
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0.0.0 Safari/537.36"
+)
+
+collected_results: list["Ad"] = []
 shutdown_requested = False
+run_ts: str | None = None
 
 logger = logging.getLogger("avito")
 
@@ -49,6 +66,10 @@ def load_config(path: Path | None = None) -> dict:
         "page_timeout": 30000,
         "selector_timeout": 10000,
         "max_retries": 2,
+        "concurrency": 3,
+        "http_fetch": True,
+        "state_max_age": 30,
+        "no_sandbox": False,
     }
     for k, v in defaults.items():
         cfg.setdefault(k, v)
@@ -116,51 +137,138 @@ def setup_logging():
     logger.addHandler(ch)
 
 
-def is_mine(title: str, keyword_groups: list[list[str]]) -> bool:
-    """Check if ad title matches any keyword group (AND within group, OR between groups)."""
-    title_lower = title.lower()
-    return any(
-        all(word.lower() in title_lower for word in group)
-        for group in keyword_groups
+def create_http_client(cfg: dict) -> httpx.AsyncClient:
+    """Create the HTTP/2 client shared by every avito.ru request in a run.
+
+    run() owns it and closes it when the run ends.
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        # Idle connections must outlive the pauses between cities,
+        # otherwise every city pays for a fresh TLS handshake (20% margin
+        # over max_delay for the time spent fetching in between)
+        limits=httpx.Limits(
+            max_connections=50,
+            max_keepalive_connections=20,
+            keepalive_expiry=max(cfg["long_pause_max"], cfg["max_delay"] * 1.2),
+        ),
+        headers={"User-Agent": USER_AGENT, "Accept-Language": "ru-RU,ru;q=0.9"},
+        follow_redirects=True,
+        timeout=cfg["page_timeout"] / 1000,
     )
 
 
-def save_results(results: list[dict], tag: str = ""):
-    """Write results to CSV and JSON. Called incrementally and on shutdown."""
+class KeywordMatcher:
+    """Match titles against keyword groups in one Aho-Corasick pass.
+
+    AND within a group, OR between groups. Keywords must already be
+    lowercased.
+    """
+
+    def __init__(self, keyword_groups: tuple[tuple[str, ...], ...]):
+        self.groups = [frozenset(g) for g in keyword_groups if g]
+        # JSON-friendly copy for the in-page extractor
+        self.group_lists = [sorted(g) for g in self.groups]
+        self._automaton = ahocorasick.Automaton()
+        for group in self.groups:
+            for word in group:
+                self._automaton.add_word(word, word)
+        self._automaton.make_automaton()
+
+    def match_many(self, titles: list[str]) -> list[bool]:
+        """Check a whole page of titles in a single automaton pass.
+
+        Titles are joined with newlines; keywords never contain whitespace,
+        so a hit cannot straddle two titles.
+        """
+        if not self.groups:
+            return [False] * len(titles)
+        lowered = [t.lower() for t in titles]
+        # ends[i] is the offset just past title i and its separator
+        ends = list(itertools.accumulate(len(t) + 1 for t in lowered))
+        hits: list[set[str]] = [set() for _ in lowered]
+        for end, word in self._automaton.iter("\n".join(lowered)):
+            hits[bisect.bisect_right(ends, end)].add(word)
+        return [any(group <= h for group in self.groups) for h in hits]
+
+
+@dataclass(slots=True)
+class Ad:
+    city: str
+    ad_position: int
+    ad_title: str
+    ad_url: str
+    ad_is_reklama: bool
+    is_mine: bool = False
+    seller_name: str = ""
+    seller_url: str = ""
+
+    def row(self) -> tuple:
+        """Values in CSV_FIELDS order."""
+        return (
+            self.city, self.ad_position, self.ad_title, self.ad_url,
+            self.ad_is_reklama, self.is_mine, self.seller_name, self.seller_url,
+        )
+
+
+CSV_FIELDS = [
+    "city", "ad_position", "ad_title", "ad_url",
+    "ad_is_reklama", "is_mine", "seller_name", "seller_url",
+]
+
+
+class ResultsWriter:
+    """Append-only CSV and JSONL output for one run.
+
+    Each city's ads are appended as soon as they are collected, so the
+    work per city stays proportional to that city's ads and a crash
+    loses nothing already written.
+    """
+
+    def __init__(self, run_ts: str):
+        OUTPUT_DIR.mkdir(exist_ok=True)
+        self.csv_path = OUTPUT_DIR / f"results_{run_ts}.csv"
+        self.jsonl_path = OUTPUT_DIR / f"results_{run_ts}.jsonl"
+        self._csv_file = open(self.csv_path, "w", newline="", encoding="utf-8-sig")
+        self._csv = csv.writer(self._csv_file)
+        self._csv.writerow(CSV_FIELDS)
+        self._jsonl_file = open(self.jsonl_path, "wb")
+
+    def append(self, ads: list[Ad]):
+        self._csv.writerows(ad.row() for ad in ads)
+        for ad in ads:
+            self._jsonl_file.write(orjson.dumps(ad) + b"\n")
+        self._csv_file.flush()
+        self._jsonl_file.flush()
+        logger.debug("Appended %d records → %s / %s",
+                     len(ads), self.csv_path.name, self.jsonl_path.name)
+
+    def close(self):
+        self._csv_file.close()
+        self._jsonl_file.close()
+
+
+def save_results(results: list[Ad], ts: str):
+    """Write the full results list to JSON. Called at the end and on shutdown."""
     OUTPUT_DIR.mkdir(exist_ok=True)
     if not results:
         return
 
-    ts = results[0].get("_run_ts", datetime.now().strftime("%Y%m%d_%H%M%S"))
-    csv_path = OUTPUT_DIR / f"results_{ts}.csv"
     json_path = OUTPUT_DIR / f"results_{ts}.json"
+    # orjson serializes dataclasses natively — no intermediate dicts
+    json_path.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
 
-    # CSV — rewrite entire file (list is small enough)
-    fieldnames = [
-        "city", "ad_position", "ad_title", "ad_url",
-        "ad_is_reklama", "is_mine", "seller_name", "seller_url",
-    ]
-    with open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
-        writer.writeheader()
-        writer.writerows(results)
-
-    # JSON
-    clean = [{k: v for k, v in r.items() if not k.startswith("_")} for r in results]
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(clean, f, ensure_ascii=False, indent=2)
+    logger.debug("Saved %d records → %s", len(results), json_path.name)
 
-    logger.debug("Saved %d records → %s / %s", len(results), csv_path.name, json_path.name)
 
-
-def print_report(results: list[dict]):
+def print_report(results: list[Ad]):
     """Print a summary table grouped by city."""
     if not results:
         return
     # Group by city preserving order
-    cities: dict[str, list[dict]] = {}
+    cities: dict[str, list[Ad]] = {}
     for r in results:
-        cities.setdefault(r["city"], []).append(r)
+        cities.setdefault(r.city, []).append(r)
 
     # Column widths
     max_city = max(len(c) for c in cities)
@@ -174,9 +282,9 @@ def print_report(results: list[dict]):
     total_ads = total_mine = 0
     for city, ads in cities.items():
         n = len(ads)
-        mine = [a for a in ads if a.get("is_mine")]
+        mine = [a for a in ads if a.is_mine]
         m = len(mine)
-        positions = ", ".join(str(a["ad_position"]) for a in mine) or "—"
+        positions = ", ".join(str(a.ad_position) for a in mine) or "—"
         print(f"{city:<{col_city}} | {n:>6} | {m:>4} | {positions}")
         total_ads += n
         total_mine += m
@@ -196,27 +304,112 @@ def save_debug_html(html: str, city: str):
 # ---------------------------------------------------------------------------
 # Browser helpers
 # ---------------------------------------------------------------------------
-async def create_browser(pw, cfg: dict):
-    browser = await pw.chromium.launch(
-        headless=cfg["headless"],
-        channel="chrome",
-    )
+async def launch_browser(pw, cfg: dict):
+    args = [
+        "--disable-dev-shm-usage",
+        "--disable-extensions",
+        "--disable-background-networking",
+        "--disable-features=TranslateUI",
+        "--blink-settings=imagesEnabled=false",
+    ]
+    # Only needed when running as root in a container; pages run third-party scripts
+    if cfg["no_sandbox"]:
+        args.append("--no-sandbox")
+    return await pw.chromium.launch(headless=cfg["headless"], args=args)
+
+
+BLOCKED_EXTENSIONS = (
+    "png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico",
+    "woff", "woff2", "ttf", "otf", "css", "mp4", "webm",
+)
+BLOCKED_DOMAINS = ("googletagmanager", "mc.yandex", "google-analytics")
+BLOCKED_URL_PATTERNS = (
+    [f"*.{ext}" for ext in BLOCKED_EXTENSIONS]
+    + [f"*.{ext}?*" for ext in BLOCKED_EXTENSIONS]
+    + [f"*{domain}*" for domain in BLOCKED_DOMAINS]
+)
+
+
+async def new_page(context):
+    """Open a page that skips subresources the catalog parser never looks at.
+
+    Blocking happens in Chromium's network stack via CDP rather than
+    context.route(), which would disable the HTTP cache for the context.
+    """
+    page = await context.new_page()
+    cdp = await context.new_cdp_session(page)
+    await cdp.send("Network.enable")
+    await cdp.send("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    return page
+
+
+async def create_context(browser, cfg: dict,
+                         storage_state: dict | Path | None = None):
     context = await browser.new_context(
         viewport={"width": 1366, "height": 768},
         locale="ru-RU",
         timezone_id="Europe/Moscow",
-        user_agent=(
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/124.0.0.0 Safari/537.36"
-        ),
+        user_agent=USER_AGENT,
+        storage_state=storage_state,
     )
     # Remove webdriver flag
     await context.add_init_script("""
         Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
     """)
-    page = await context.new_page()
-    return browser, context, page
+    # Define the extractor once per document so each city only sends a call
+    await context.add_init_script(f"window.extractAds = {EXTRACT_ADS_JS};")
+    return context
+
+
+class PagePool:
+    """Fixed set of pages, one per browser context, handed out to workers.
+
+    Pages live for the whole run, so cookies, cache and connections to
+    avito.ru are kept between cities instead of being rebuilt each time.
+    """
+
+    def __init__(self):
+        self.pages: list = []
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def add(self, page):
+        self.pages.append(page)
+        self._queue.put_nowait(page)
+
+    async def fill(self, browser, cfg: dict, size: int,
+                   storage_state: dict):
+        """Top the pool up to `size` pages, cloning cookies from storage_state."""
+        while len(self.pages) < size:
+            context = await create_context(browser, cfg, storage_state)
+            self.add(await new_page(context))
+
+    async def get(self):
+        return await self._queue.get()
+
+    async def put(self, page):
+        await self._queue.put(page)
+
+    async def close(self):
+        for page in self.pages:
+            try:
+                await page.context.close()
+            except Exception:
+                pass
+
+
+def saved_storage_state(cfg: dict) -> Path | None:
+    """Return the cookies saved by a previous run if they are fresh enough to skip warmup."""
+    if not STATE_PATH.exists():
+        return None
+    age = time.time() - STATE_PATH.stat().st_mtime
+    if age > cfg["state_max_age"] * 60:
+        return None
+    return STATE_PATH
+
+
+def forget_storage_state():
+    """Drop saved cookies so the next run warms up from scratch."""
+    STATE_PATH.unlink(missing_ok=True)
 
 
 async def warm_cookies(page, cfg: dict):
@@ -227,15 +420,25 @@ async def warm_cookies(page, cfg: dict):
     await asyncio.sleep(random.uniform(3, 5))
 
 
-async def smooth_scroll(page, times: int = 3):
-    """Simulate human-like scrolling."""
-    for _ in range(times):
-        await page.evaluate("window.scrollBy(0, window.innerHeight * 0.7)")
-        await asyncio.sleep(random.uniform(0.5, 1.5))
+SCROLL_PAGE_JS = """
+async () => {
+    const step = window.innerHeight * 0.7;
+    for (let y = 0; y < document.body.scrollHeight; y += step) {
+        window.scrollBy(0, step);
+        await new Promise(r => requestAnimationFrame(r));
+    }
+    await new Promise(r => requestIdleCallback(r, { timeout: 500 }));
+}
+"""
+
+
+async def scroll_page(page):
+    """Scroll through the whole page in one round-trip, resolving once idle."""
+    await page.evaluate(SCROLL_PAGE_JS)
 
 
 EXTRACT_ADS_JS = """
-() => {
+({ city, kwGroups }) => {
     const container = document.querySelector('[data-marker="catalog-serp"]');
     if (!container) return null;
 
@@ -250,6 +453,10 @@ EXTRACT_ADS_JS = """
 
         const isReklama = item.innerText.includes('Реклама');
 
+        // Same rule as KeywordMatcher: AND within a group, OR between groups
+        const titleLower = adTitle.toLowerCase();
+        const isMine = kwGroups.some(g => g.every(w => titleLower.includes(w)));
+
         // Seller link: contains /brands/ or /user/ with ?src=search_seller_info
         let sellerName = '';
         let sellerUrl = '';
@@ -263,70 +470,313 @@ EXTRACT_ADS_JS = """
         }
 
         ads.push({
+            city,
             ad_position: index + 1,
             ad_title: adTitle,
             ad_url: adUrl,
             ad_is_reklama: isReklama,
+            is_mine: isMine,
             seller_name: sellerName,
             seller_url: sellerUrl,
         });
     });
 
-    return ads;
+    // One string crosses the protocol instead of a tree of remote objects
+    return JSON.stringify(ads);
 }
 """
 
 
-async def extract_ads(page, city: str, cfg: dict) -> list[dict] | None:
-    """Extract ad listings from the current page via page.evaluate()."""
+async def extract_ads(page, city: str, cfg: dict, matcher: KeywordMatcher,
+                      save_debug: bool = False) -> list[dict] | None:
+    """Extract ad listings from the current page via page.evaluate().
+
+    Keyword groups travel as an evaluate argument rather than a page
+    global, so the site's own scripts never see them.
+
+    Debug HTML is only dumped when save_debug is set: page.content() ships
+    the whole DOM over the protocol, which is wasted on one-off flakes.
+    """
     try:
         await page.wait_for_selector(
             '[data-marker="catalog-serp"]',
             timeout=cfg["selector_timeout"],
         )
     except Exception:
-        logger.warning("[%s] Catalog container not found, saving debug HTML", city)
-        html = await page.content()
-        save_debug_html(html, city)
+        logger.warning("[%s] Catalog container not found", city)
+        if save_debug:
+            save_debug_html(await page.content(), city)
         return None
 
-    await smooth_scroll(page, random.randint(2, 4))
+    await scroll_page(page)
 
-    ads = await page.evaluate(EXTRACT_ADS_JS)
+    raw = await page.evaluate(
+        "(args) => extractAds(args)",
+        {"city": city, "kwGroups": matcher.group_lists},
+    )
+    ads = orjson.loads(raw) if raw else None
     if ads is None:
         logger.warning("[%s] page.evaluate returned null", city)
-        html = await page.content()
-        save_debug_html(html, city)
+        if save_debug:
+            save_debug_html(await page.content(), city)
         return None
 
     return ads
 
 
+# ---------------------------------------------------------------------------
+# Pacing
+# ---------------------------------------------------------------------------
+class DelayController:
+    """Adaptive delay between cities, shared by all workers.
+
+    Starts at max_delay and shrinks by 10% after each successful city down
+    to min_delay; any block snaps it back to max_delay.
+    """
+
+    def __init__(self, cfg: dict):
+        self.min_delay = cfg["min_delay"]
+        self.max_delay = cfg["max_delay"]
+        self.current = self.max_delay
+
+    def success(self):
+        self.current = max(self.min_delay, self.current * 0.9)
+
+    def blocked(self):
+        self.current = self.max_delay
+
+    def next(self) -> float:
+        jittered = random.uniform(self.current * 0.8, self.current * 1.2)
+        return min(max(jittered, self.min_delay), self.max_delay)
+
+
+# ---------------------------------------------------------------------------
+# Plain HTTP extraction
+# ---------------------------------------------------------------------------
+class CatalogParser(HTMLParser):
+    """Parse ads from server-rendered catalog HTML.
+
+    Mirrors EXTRACT_ADS_JS: same data-marker selectors, same fields.
+    Open elements are kept on a stack by tag name, so an end tag closes
+    everything left unclosed inside it (e.g. implicit </li>), and stray
+    end tags are ignored.
+    """
+
+    VOID_TAGS = {
+        "area", "base", "br", "col", "embed", "hr", "img", "input",
+        "link", "meta", "param", "source", "track", "wbr",
+    }
+
+    def __init__(self, city: str):
+        super().__init__(convert_charrefs=True)
+        self.city = city
+        self.found_container = False
+        self.ads: list[dict] = []
+        self._done = False
+        self._stack: list[tuple[str, str | None]] = []  # (tag, role)
+        self._item = None
+        self._item_text: list[str] = []
+        self._link = None  # (kind, text parts)
+
+    def handle_starttag(self, tag, attrs):
+        if self._done or tag in self.VOID_TAGS:
+            return
+        attrs = dict(attrs)
+        marker = attrs.get("data-marker")
+        role = None
+
+        if not self.found_container:
+            if marker == "catalog-serp":
+                self.found_container = True
+                role = "container"
+        elif self._item is None:
+            if marker == "item":
+                self._item = {
+                    "city": self.city,
+                    "ad_position": len(self.ads) + 1,
+                    "ad_title": "",
+                    "ad_url": "",
+                    "ad_is_reklama": False,
+                    "seller_name": "",
+                    "seller_url": "",
+                }
+                self._item_text = []
+                role = "item"
+        elif tag == "a" and self._link is None:
+            href = attrs.get("href") or ""
+            if marker == "item-title" and not self._item["ad_url"]:
+                self._item["ad_url"] = urljoin("https://www.avito.ru", href).split("?")[0]
+                self._link = ("title", [])
+                role = "link"
+            elif "src=search_seller_info" in href and not self._item["seller_url"]:
+                self._item["seller_url"] = urljoin("https://www.avito.ru", href).split("?")[0]
+                self._link = ("seller", [])
+                role = "link"
+
+        self._stack.append((tag, role))
+
+    def handle_endtag(self, tag):
+        if self._done or tag in self.VOID_TAGS:
+            return
+        if all(t != tag for t, _ in self._stack):
+            return  # stray end tag
+        while self._stack:
+            t, role = self._stack.pop()
+            if role is not None:
+                self._close(role)
+            if t == tag:
+                break
+
+    def _close(self, role: str):
+        if role == "link":
+            kind, parts = self._link
+            text = "".join(parts).strip()
+            if kind == "title":
+                self._item["ad_title"] = text
+            else:
+                self._item["seller_name"] = re.sub(r"[\d.,]+·.*$", "", text).strip()
+            self._link = None
+        elif role == "item":
+            self._item["ad_is_reklama"] = "Реклама" in "".join(self._item_text)
+            self.ads.append(self._item)
+            self._item = None
+        elif role == "container":
+            self._done = True  # ignore the rest of the page
+
+    def handle_data(self, data):
+        if self._item is not None:
+            self._item_text.append(data)
+            if self._link is not None:
+                self._link[1].append(data)
+
+
+async def extract_ads_http(client: httpx.AsyncClient, url: str, city: str,
+                           cfg: dict) -> list[dict] | None:
+    """Fetch the catalog page over plain HTTP and parse ads from its HTML.
+
+    Returns None when the request fails, Avito refuses it or the catalog is
+    missing, so the caller can fall back to the browser. A refusal turns
+    http_fetch off for the rest of the run — the client would only be
+    refused again. Pacing and saved cookies are left alone: the browser
+    decides whether we are actually blocked.
+    """
+    try:
+        resp = await client.get(url)
+    except httpx.HTTPError as e:
+        logger.info("[%s] HTTP fetch failed (%s), falling back to browser", city, e)
+        return None
+    blocked = resp.status_code in (403, 429) or url_looks_like_captcha(str(resp.url))
+    if blocked:
+        cfg["http_fetch"] = False
+        logger.warning("[%s] HTTP fetch refused (%d), using the browser only from now on",
+                       city, resp.status_code)
+        return None
+    if resp.status_code != 200:
+        logger.info("[%s] HTTP fetch got %d, falling back to browser", city, resp.status_code)
+        return None
+
+    parser = CatalogParser(city)
+    parser.feed(resp.text)
+    parser.close()
+    if not parser.found_container or not parser.ads:
+        logger.info("[%s] No ads in HTTP response, falling back to browser", city)
+        return None
+    return parser.ads
+
+
 # ---------------------------------------------------------------------------
 # Captcha detection
 # ---------------------------------------------------------------------------
+CAPTCHA_URL_RE = re.compile(r"captcha|challenge|blocked|showcaptcha", re.I)
+CAPTCHA_TITLE_RE = re.compile(r"доступ ограничен|проблема с ip|captcha", re.I)
+
+
+def url_looks_like_captcha(url: str) -> bool:
+    return bool(CAPTCHA_URL_RE.search(url))
+
+
 async def looks_like_captcha(page) -> bool:
-    url_lower = page.url.lower()
-    url_hints = ["captcha", "challenge", "blocked", "showcaptcha"]
-    if any(h in url_lower for h in url_hints):
+    # URL first: it is local, while page.title() is a protocol round-trip
+    if url_looks_like_captcha(page.url):
         return True
     try:
-        title = await page.title()
-        title_hints = ["доступ ограничен", "проблема с ip", "captcha"]
-        if any(h in title.lower() for h in title_hints):
-            return True
+        return bool(CAPTCHA_TITLE_RE.search(await page.title()))
     except Exception:
-        pass
-    return False
+        return False
 
 
 # ---------------------------------------------------------------------------
 # Main loop
 # ---------------------------------------------------------------------------
+async def back_off_blocked(city: str, delays: DelayController):
+    """React to a captcha/IP block: drop saved cookies, slow down and pause."""
+    forget_storage_state()
+    delays.blocked()
+    pause = random.uniform(60, 120)
+    logger.warning("[%s] Captcha detected, pausing %.0fs", city, pause)
+    await asyncio.sleep(pause)
+
+
+async def scrape_city(page, client: httpx.AsyncClient | None, city: str, url: str,
+                      cfg: dict, matcher: KeywordMatcher,
+                      delays: DelayController) -> list[Ad] | None:
+    """Load one city page and extract its ads, retrying on errors.
+
+    Tries a plain HTTP fetch first (when a client is given) and falls
+    back to the browser page. Returns None when all retries are exhausted.
+    """
+    for attempt in range(cfg["max_retries"] + 1):
+        try:
+            ads = None
+            if client is not None and cfg["http_fetch"]:
+                ads = await extract_ads_http(client, url, city, cfg)
+                if ads is not None:
+                    mine = matcher.match_many([ad["ad_title"] for ad in ads])
+                    for ad, m in zip(ads, mine):
+                        ad["is_mine"] = m
+
+            if ads is None:
+                # Return on first byte — the selector wait in extract_ads
+                # is what actually tells us the catalog is ready. A goto
+                # timeout still fails the attempt: the pooled page would
+                # otherwise keep showing the previous city's catalog.
+                resp = await page.goto(
+                    url,
+                    wait_until="commit",
+                    timeout=cfg["page_timeout"],
+                )
+
+                # Captcha check — the title is not parsed yet at commit,
+                # so rely on the status code and URL here
+                if (resp is not None and resp.status in (403, 429)) or await looks_like_captcha(page):
+                    await back_off_blocked(city, delays)
+                    continue
+
+                # is_mine is already computed in the page by EXTRACT_ADS_JS
+                ads = await extract_ads(page, city, cfg, matcher, save_debug=attempt >= 1)
+                if ads is None:
+                    # By now the document is parsed, so a title-only block page shows up
+                    if await looks_like_captcha(page):
+                        await back_off_blocked(city, delays)
+                        continue
+                    raise RuntimeError("Failed to extract ads")
+
+            return [Ad(**ad) for ad in ads]
+
+        except Exception as e:
+            logger.warning(
+                "[%s] Attempt %d/%d failed: %s",
+                city, attempt + 1, cfg["max_retries"] + 1, e,
+            )
+            await asyncio.sleep(random.uniform(10, 20))
+
+    return None
+
+
 async def run(cfg: dict, category_path: str, cities: list[str],
-              keywords: list[list[str]], skip: int = 0,
-              query: str | None = None):
-    global collected_results, shutdown_requested
+              matcher: KeywordMatcher, skip: int = 0,
+              query: str | None = None, client: httpx.AsyncClient | None = None):
+    global collected_results, shutdown_requested, run_ts
 
     run_ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     if skip > 0:
@@ -335,104 +785,117 @@ async def run(cfg: dict, category_path: str, cities: list[str],
 
     if not cities:
         logger.error("No cities to process. Check cities.txt")
+        if client is not None:
+            await client.aclose()
         return
 
-    logger.info("Starting scan: %d cities, category: %s%s",
-                len(cities), category_path,
+    logger.info("Starting scan: %d cities, concurrency: %d, category: %s%s",
+                len(cities), cfg["concurrency"], category_path,
                 f", query: {unquote(query)}" if query else "")
 
+    pool = PagePool()
+    writer = None
+    results_lock = asyncio.Lock()
+    delays = DelayController(cfg)
     consecutive_errors = 0
+    processed = 0
+    stop_early = False
 
     async with async_playwright() as pw:
-        browser, context, page = await create_browser(pw, cfg)
+        browser = await launch_browser(pw, cfg)
 
-        try:
-            await warm_cookies(page, cfg)
-
-            for i, city in enumerate(cities, start=1):
-                if shutdown_requested:
-                    logger.info("Shutdown requested, stopping after %d cities", i - 1)
-                    break
+        async def worker(i: int, city: str):
+            nonlocal consecutive_errors, processed, stop_early
+            page = await pool.get()
+            try:
+                if shutdown_requested or stop_early:
+                    return
 
                 url = f"https://www.avito.ru/{city}/{category_path}" + (f"?{query}" if query else "")
                 logger.info("[%d/%d] %s", i, len(cities), city)
 
-                success = False
-                for attempt in range(cfg["max_retries"] + 1):
-                    try:
-                        resp = await page.goto(
-                            url,
-                            wait_until="domcontentloaded",
-                            timeout=cfg["page_timeout"],
-                        )
-
-                        # Captcha check
-                        if await looks_like_captcha(page):
-                            pause = random.uniform(60, 120)
-                            logger.warning("[%s] Captcha detected, pausing %.0fs", city, pause)
-                            await asyncio.sleep(pause)
-                            continue
-
-                        ads = await extract_ads(page, city, cfg)
-                        if ads is None:
-                            raise RuntimeError("Failed to extract ads")
-
-                        mine_count = 0
-                        for ad in ads:
-                            ad["city"] = city
-                            ad["is_mine"] = is_mine(ad["ad_title"], keywords)
-                            ad["_run_ts"] = run_ts
-                            if ad["is_mine"]:
-                                mine_count += 1
+                ads = await scrape_city(page, client, city, url, cfg, matcher, delays)
+                processed += 1
 
-                        collected_results.extend(ads)
-                        save_results(collected_results, city)
-
-                        logger.info(
-                            "[%s] %d ads, %d mine (positions: %s)",
-                            city,
-                            len(ads),
-                            mine_count,
-                            ", ".join(
-                                str(a["ad_position"])
-                                for a in ads
-                                if a["is_mine"]
-                            ) or "—",
-                        )
-
-                        consecutive_errors = 0
-                        success = True
-                        break
-
-                    except Exception as e:
-                        logger.warning(
-                            "[%s] Attempt %d/%d failed: %s",
-                            city, attempt + 1, cfg["max_retries"] + 1, e,
-                        )
-                        await asyncio.sleep(random.uniform(10, 20))
-
-                if not success:
+                if ads is None:
                     consecutive_errors += 1
                     logger.error("[%s] All retries exhausted", city)
                     if consecutive_errors >= 5:
-                        logger.error("5 consecutive errors — stopping early")
-                        break
-
-                # Delay between cities
+                        if not stop_early:
+                            logger.error("5 consecutive errors — stopping early")
+                        stop_early = True
+                        return
+                else:
+                    # File writes run in a thread; the lock keeps them ordered
+                    async with results_lock:
+                        collected_results.extend(ads)
+                        await asyncio.to_thread(writer.append, ads)
+
+                    logger.info(
+                        "[%s] %d ads, %d mine (positions: %s)",
+                        city,
+                        len(ads),
+                        sum(1 for a in ads if a.is_mine),
+                        ", ".join(
+                            str(a.ad_position)
+                            for a in ads
+                            if a.is_mine
+                        ) or "—",
+                    )
+                    consecutive_errors = 0
+                    delays.success()
+
+                # Delay between cities — taken before the page goes back to
+                # the pool, so pacing applies per context rather than globally
                 if i % cfg["long_pause_every"] == 0:
                     pause = random.uniform(cfg["long_pause_min"], cfg["long_pause_max"])
                     logger.info("Long pause: %.1fs", pause)
                     await asyncio.sleep(pause)
                 else:
-                    await asyncio.sleep(random.uniform(cfg["min_delay"], cfg["max_delay"]))
+                    await asyncio.sleep(delays.next())
+            finally:
+                await pool.put(page)
+
+        try:
+            saved_state = saved_storage_state(cfg)
+            warm_context = await create_context(browser, cfg, saved_state)
+            warm_page = await new_page(warm_context)
+            if saved_state is None:
+                await warm_cookies(warm_page, cfg)
+                OUTPUT_DIR.mkdir(exist_ok=True)
+                await warm_context.storage_state(path=STATE_PATH)
+            else:
+                logger.info("Reusing saved cookies from %s", STATE_PATH.name)
+            pool.add(warm_page)
+            await pool.fill(browser, cfg, cfg["concurrency"],
+                            await warm_context.storage_state())
+
+            if client is not None:
+                for c in await warm_context.cookies():
+                    client.cookies.set(c["name"], c["value"], domain=c["domain"], path=c["path"])
+
+            # Opened only once the browser is up, so a failed start leaves no empty files
+            writer = ResultsWriter(run_ts)
+            await asyncio.gather(*[
+                worker(i, city)
+                for i, city in enumerate(cities, start=1)
+            ])
+
+            if shutdown_requested:
+                logger.info("Shutdown requested, stopped after %d cities", processed)
 
         finally:
+            if writer is not None:
+                writer.close()
+            if client is not None:
+                await client.aclose()
+            await pool.close()
             try:
                 await browser.close()
             except Exception:
                 pass
 
-    save_results(collected_results)
+    save_results(collected_results, run_ts)
     print_report(collected_results)
     logger.info("Done. Total records: %d", len(collected_results))
 
@@ -444,9 +907,9 @@ def handle_signal(signum, frame):
     global shutdown_requested
     if shutdown_requested:
         logger.warning("Force quit — saving partial results")
-        save_results(collected_results)
+        save_results(collected_results, run_ts)
         sys.exit(1)
-    logger.info("Ctrl+C received — finishing current city, then saving …")
+    logger.info("Ctrl+C received — finishing current cities, then saving …")
     shutdown_requested = True
 
 
@@ -483,7 +946,10 @@ def main():
     if args.debug:
         cfg["headless"] = False
 
-    asyncio.run(run(cfg, category_path, cities, keywords, skip=args.skip, query=query))
+    client = create_http_client(cfg) if cfg["http_fetch"] else None
+    matcher = KeywordMatcher(tuple(tuple(w.lower() for w in g) for g in keywords))
+    asyncio.run(run(cfg, category_path, cities, matcher, skip=args.skip, query=query,
+                    client=client))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+from main import CatalogParser
+
+
+def parse(html: str) -> CatalogParser:
+    parser = CatalogParser("moskva")
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+def test_extracts_ad_fields():
+    parser = parse("""
+        <div data-marker="catalog-serp">
+          <div data-marker="item">
+            <img src="x.jpg"><br/>
+            <a data-marker="item-title" href="/moskva/uslugi/bot_1?context=abc"><h3>Чат-бот &amp; сайт</h3></a>
+            <span>Реклама</span>
+            <a href="/brands/romashka?src=search_seller_info">Ромашка4.9·12 отзывов</a>
+          </div>
+        </div>
+    """)
+    assert parser.found_container
+    assert parser.ads == [{
+        "city": "moskva",
+        "ad_position": 1,
+        "ad_title": "Чат-бот & сайт",
+        "ad_url": "https://www.avito.ru/moskva/uslugi/bot_1",
+        "ad_is_reklama": True,
+        "seller_name": "Ромашка",
+        "seller_url": "https://www.avito.ru/brands/romashka",
+    }]
+
+
+def test_unclosed_tags_do_not_shift_item_boundaries():
+    parser = parse("""
+        <div data-marker="catalog-serp">
+          <div data-marker="item"><ul><li>one<li>two</ul>
+            <a data-marker="item-title" href="/a">First</a></div>
+          <div data-marker="item"><p>no closing p
+            <a data-marker="item-title" href="/b">Second</a></div>
+        </div>
+        <div data-marker="item"><a data-marker="item-title" href="/c">Outside</a></div>
+    """)
+    assert [a["ad_title"] for a in parser.ads] == ["First", "Second"]
+    assert [a["ad_position"] for a in parser.ads] == [1, 2]
+
+
+def test_stray_end_tags_are_ignored():
+    parser = parse("""
+        <div data-marker="catalog-serp"></span>
+          <div data-marker="item"></li><a data-marker="item-title" href="/a">Only</a></div>
+        </div>
+    """)
+    assert [a["ad_title"] for a in parser.ads] == ["Only"]
+
+
+def test_no_container():
+    parser = parse('<div data-marker="item"><a data-marker="item-title" href="/a">x</a></div>')
+    assert not parser.found_container
+    assert parser.ads == []
@@ -0,0 +1,35 @@
+from main import KeywordMatcher
+
+
+def make_matcher(*groups: str) -> KeywordMatcher:
+    return KeywordMatcher(tuple(tuple(g.lower().split()) for g in groups))
+
+
+def test_and_within_group_or_between_groups():
+    matcher = make_matcher("Ии-ассистент под ключ", "чат-бот разработка")
+    titles = [
+        "ИИ-АССИСТЕНТ для бизнеса под ключ",  # all words of group 1
+        "Ии-ассистент для бизнеса",           # only part of group 1
+        "Разработка: чат-бот для Telegram",   # all words of group 2
+        "Создание сайтов",                    # nothing
+    ]
+    assert matcher.match_many(titles) == [True, False, True, False]
+
+
+def test_group_split_across_adjacent_titles_does_not_match():
+    matcher = make_matcher("чат-бот разработка")
+    assert matcher.match_many(["чат-бот", "разработка"]) == [False, False]
+    assert matcher.match_many(["разработка", "чат-бот", "чат-бот разработка"]) == [
+        False, False, True,
+    ]
+
+
+def test_empty_titles_and_empty_groups():
+    assert make_matcher("чат-бот").match_many([]) == []
+    assert make_matcher().match_many(["чат-бот", ""]) == [False, False]
+
+
+def test_title_with_internal_newline():
+    matcher = make_matcher("чат-бот разработка", "сайт")
+    titles = ["чат-бот\nразработка", "лендинг", "сайт"]
+    assert matcher.match_many(titles) == [True, False, True]